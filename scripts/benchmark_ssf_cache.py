@@ -0,0 +1,85 @@
+#!/usr/bin/env python
+
+## Compare loading a large synthetic SSF from text with loading it through its columnar cache (`ssf_cache.py`).
+##   The cache pays off for column access (e.g. tallying instrument models or summing fastq_bytes), where only the
+##   needed columns are touched. Rebuilding every row from the cache is included for comparison.
+
+VERSION = "1.0.0"
+
+import os
+import sys
+import time
+import argparse
+import tempfile
+from collections import Counter
+
+from ssf_cache import load_ssf, parse_ssf_lines
+from benchmark_ssf_records import synthetic_ssf_lines
+
+
+def best_time(func, repeats):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        times.append(time.perf_counter() - start)
+    return min(times), result
+
+
+def text_columns(ssf_path):
+    with open(ssf_path, "r") as f:
+        headers, rows = parse_ssf_lines(f.readlines())
+    model_idx, bytes_idx = headers.index("instrument_model"), headers.index("fastq_bytes")
+    return Counter(row[model_idx] for row in rows), sum(int(row[bytes_idx]) for row in rows)
+
+
+def cache_columns(ssf_path):
+    with load_ssf(ssf_path) as cache:
+        return Counter(cache.column("instrument_model")), sum(int(value) for value in cache.column("fastq_bytes"))
+
+
+def text_rows(ssf_path):
+    with open(ssf_path, "r") as f:
+        return len(parse_ssf_lines(f.readlines())[1])
+
+
+def cache_rows(ssf_path):
+    with load_ssf(ssf_path) as cache:
+        return len(list(cache.rows()))
+
+
+def parse_args(args=None):
+    Description = "Benchmark loading a large synthetic SSF from text vs. from its columnar cache."
+    Epilog = "Example usage: python benchmark_ssf_cache.py --rows 200000"
+
+    parser = argparse.ArgumentParser(description=Description, epilog=Epilog)
+    parser.add_argument("--rows", type=int, default=200000, help="Number of rows in the synthetic SSF. Default: 200000")
+    parser.add_argument("--repeats", type=int, default=3, help="Number of timed runs per case (best is reported). Default: 3")
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    args = parse_args(args)
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        ssf_path = os.path.join(tmp_dir, "synthetic.ssf")
+        with open(ssf_path, "w") as f:
+            f.writelines(synthetic_ssf_lines(args.rows))
+        ## Build the cache once, as a first run of any cache-aware tool would.
+        load_ssf(ssf_path).close()
+
+        print("Rows: {}".format(args.rows))
+        print("{:<36}{:>10}{:>10}{:>10}".format("Case", "Text (s)", "Cache (s)", "Speedup"))
+        for name, text_func, cache_func in [
+            ("instrument_model + fastq_bytes", text_columns, cache_columns),
+            ("all rows", text_rows, cache_rows),
+        ]:
+            text_time, text_result = best_time(lambda: text_func(ssf_path), args.repeats)
+            cache_time, cache_result = best_time(lambda: cache_func(ssf_path), args.repeats)
+            if text_result != cache_result:
+                raise RuntimeError("Text and cache results differ for '{}'.".format(name))
+            print("{:<36}{:>10.2f}{:>10.2f}{:>9.1f}x".format(name, text_time, cache_time, text_time / cache_time))
+
+
+if __name__ == "__main__":
+    print("[benchmark_ssf_cache.py]: version {}".format(VERSION), file=sys.stderr)
+    sys.exit(main())
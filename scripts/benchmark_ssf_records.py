@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+
+## Compare the memory used by holding a whole SSF in memory as per-row dicts vs. as SSFRecords.
+##   A synthetic SSF with realistic, repetitive column values is parsed from text once per representation, so every row
+##   starts out with its own freshly split strings, as it would when read from disk.
+
+VERSION = "1.0.0"
+
+import sys
+import time
+import random
+import argparse
+import tracemalloc
+
+from ssf_cache import parse_ssf_lines
+from ssf_record import record_factory
+
+HEADERS = [
+    "poseidon_IDs",
+    "udg",
+    "library_built",
+    "notes",
+    "sample_accession",
+    "study_accession",
+    "run_accession",
+    "sample_alias",
+    "secondary_sample_accession",
+    "first_public",
+    "last_updated",
+    "instrument_model",
+    "library_layout",
+    "library_source",
+    "instrument_platform",
+    "library_name",
+    "library_strategy",
+    "fastq_ftp",
+    "fastq_aspera",
+    "fastq_bytes",
+    "fastq_md5",
+    "read_count",
+    "submitted_ftp",
+    "submitted_md5",
+]
+
+
+def synthetic_ssf_lines(n_rows, seed=42):
+    rng = random.Random(seed)
+    lines = ["\t".join(HEADERS) + "\n"]
+    for i in range(n_rows):
+        run = "ERR{:07d}".format(7000000 + i)
+        ind = "I{:05d}".format(i // 4)
+        fastq = "ftp.sra.ebi.ac.uk/vol1/fastq/{}/{:03d}/{}/{}.fastq.gz".format(run[:6], i % 1000, run, run)
+        row = [
+            ind,
+            rng.choice(["minus", "half", "plus"]),
+            rng.choice(["ds", "ss"]),
+            "n/a",
+            "SAMEA{:08d}".format(i),
+            "PRJEB{:05d}".format(47891 + i // 5000),
+            run,
+            ind,
+            "ERS{:07d}".format(8000000 + i),
+            "2021-10-29",
+            "2021-10-29",
+            rng.choice(["Illumina HiSeq X", "Illumina NovaSeq 6000", "NextSeq 500"]),
+            rng.choice(["SINGLE", "PAIRED"]),
+            "GENOMIC",
+            "ILLUMINA",
+            "{}_lib{}".format(ind, i % 4),
+            "WGS",
+            fastq,
+            fastq.replace("ftp.", "fasp.", 1),
+            str(rng.randrange(10**6, 10**10)),
+            "{:032x}".format(rng.getrandbits(128)),
+            str(rng.randrange(10**4, 10**8)),
+            "ftp.sra.ebi.ac.uk/vol1/run/{}/{}/{}.bam".format(run[:6], run, ind),
+            "{:032x}".format(rng.getrandbits(128)),
+        ]
+        lines.append("\t".join(row) + "\n")
+    return lines
+
+
+def measure(lines, build):
+    """
+    Return the memory held by the rows built from `lines` (in bytes) and the time taken to build them (in seconds).
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    rows = build(lines)
+    elapsed = time.perf_counter() - start
+    size = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del rows
+    return size, elapsed
+
+
+def as_dicts(lines):
+    headers, rows = parse_ssf_lines(lines)
+    return [dict(zip(headers, row)) for row in rows]
+
+
+def as_records(lines):
+    headers, rows = parse_ssf_lines(lines)
+    make_record = record_factory(headers)
+    return [make_record(row) for row in rows]
+
+
+def parse_args(args=None):
+    Description = "Benchmark the memory used by per-row dicts and SSFRecords for a large synthetic SSF."
+    Epilog = "Example usage: python benchmark_ssf_records.py --rows 200000"
+
+    parser = argparse.ArgumentParser(description=Description, epilog=Epilog)
+    parser.add_argument("--rows", type=int, default=100000, help="Number of rows in the synthetic SSF. Default: 100000")
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    args = parse_args(args)
+    lines = synthetic_ssf_lines(args.rows)
+    results = [("dict", *measure(lines, as_dicts)), ("SSFRecord", *measure(lines, as_records))]
+
+    print("Rows: {}".format(args.rows))
+    print("{:<12}{:>12}{:>14}{:>12}".format("Type", "Memory (MB)", "Bytes per row", "Time (s)"))
+    for name, size, elapsed in results:
+        print("{:<12}{:>12.1f}{:>14.0f}{:>12.2f}".format(name, size / 2**20, size / args.rows, elapsed))
+    print("Memory reduction: {:.1%}".format(1 - results[1][1] / results[0][1]))
+
+
+if __name__ == "__main__":
+    print("[benchmark_ssf_records.py]: version {}".format(VERSION), file=sys.stderr)
+    sys.exit(main())
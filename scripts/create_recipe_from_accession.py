@@ -0,0 +1,268 @@
+#!/usr/bin/env python3
+
+## Streaming version of the recipe creation steps: create_ssf_from_{ena,gsa}_project.py -> ssf_validator.py -> create_eager_input.sh
+##   Rows flow through column injection, validation and eager TSV row creation as a chain of generators, while the SSF and
+##   the TSV are written side by side. Validation errors are reported as soon as the offending row arrives, and only the
+##   rows still in flight are held in memory.
+
+VERSION = "0.1.4"
+
+import argparse
+import http.client
+import os
+import queue
+import sys
+import threading
+import urllib.error
+import urllib.request
+
+import eager_input
+from create_ssf_from_ena_project import ENA_FILEREPORT_URL, additional_cols, filereport_url, with_retries
+from ssf_validator import REQUIRED_FIELDS, check_ssf_header, print_error, validate_ssf_entry
+
+
+def log(message):
+    print(f"[create_recipe_from_accession.py] {message}", file=sys.stderr)
+
+
+def fetch_ena_rows(accession_id, base_url=ENA_FILEREPORT_URL, retries=5, timeout=300):
+    """
+    Stream the ENA filereport of a project. Returns the header and a generator over the rows, which yields each row as
+    soon as it has been received.
+    Opening the connection is retried on failure. Once rows have been yielded the stream cannot be retried, so a dropped
+    connection (or a table cut off mid-line) raises an error instead.
+    """
+    url = filereport_url(accession_id, base_url=base_url)
+    log(f"Streaming the ENA table from the following URL: {url}")
+    result = with_retries(lambda: urllib.request.urlopen(url, timeout=timeout), retries)
+    ## Try to infer byte encoding from the server. if not provided use utf-8 as default.
+    byte_encoding = result.headers.get_content_charset()
+    if byte_encoding is None:
+        byte_encoding = "utf-8"
+    headers = result.readline().decode(byte_encoding).rstrip("\r\n").split("\t")
+
+    def rows():
+        with result:
+            for line in result:
+                ## ENA tables always end in a newline, so anything else means the connection dropped mid-table.
+                if not line.endswith(b"\n"):
+                    raise http.client.IncompleteRead(line)
+                line = line.decode(byte_encoding).rstrip("\r\n")
+                if line:
+                    yield line.split("\t")
+
+    return headers, rows()
+
+
+def fetch_gsa_rows(accession_number):
+    """
+    Build the SSF rows of a GSA project. The GSA only provides an Excel file, so this cannot start yielding rows before
+    the download has finished.
+    """
+    ## Only needed for GSA projects, and pulls in pandas.
+    import create_ssf_from_gsa_project as gsa
+
+    xls = gsa.download_xlsx(accession_number)
+    if xls is None:
+        raise RuntimeError(f"Failed to download the GSA table for {accession_number}.")
+    ssf = gsa.df_to_ssf_df(gsa.merge_sheets_by_accessions(xls, "Accession"), gsa.SSF_COLUMNS, accession_number)
+    if ssf is None:
+        raise RuntimeError(f"Failed to create SSF rows for {accession_number}.")
+
+    def to_str(value):
+        ## Missing values (NaN/None) are written as empty fields, like `save_ssf_to_file` (`to_csv`) does, not as 'nan'.
+        return "" if gsa.pd.isna(value) else str(value)
+
+    return list(ssf.columns), ([to_str(value) for value in row] for row in ssf.itertuples(index=False, name=None))
+
+
+def prefetch(rows, buffer_size):
+    """
+    Pull rows from `rows` in a background thread, keeping at most `buffer_size` of them waiting. This lets the download
+    continue while earlier rows are being processed.
+    """
+    buffer = queue.Queue(maxsize=buffer_size)
+    done = object()
+
+    def producer():
+        try:
+            for row in rows:
+                buffer.put(row)
+            buffer.put((done, None))
+        except BaseException as e:
+            buffer.put((done, e))
+
+    threading.Thread(target=producer, daemon=True).start()
+    while True:
+        row = buffer.get()
+        if isinstance(row, tuple) and row[0] is done:
+            if row[1] is not None:
+                raise row[1]
+            return
+        yield row
+
+
+def inject_columns(headers, rows, column_values, poseidon_ids_from=None):
+    """
+    Add the poseidon_IDs, udg, library_built and notes columns to the front of the table if they are missing, and fill
+    them with the given values ('n/a' by default). poseidon_IDs can instead be copied from another column.
+    Returns the new header and a generator over the new rows.
+    """
+    added = [col for col in additional_cols if col not in headers]
+    new_headers = added + headers
+    if poseidon_ids_from is not None and poseidon_ids_from not in new_headers:
+        raise ValueError(f"Cannot copy poseidon_IDs from column '{poseidon_ids_from}', which is not in the table.")
+    added_values = [column_values.get(col) or "n/a" for col in added]
+    ## Columns that already exist are only overwritten if a value was given for them.
+    overwrite = [
+        (new_headers.index(col), value) for col, value in column_values.items() if value and col in headers
+    ]
+    pid_idx = new_headers.index("poseidon_IDs")
+    source_idx = new_headers.index(poseidon_ids_from) if poseidon_ids_from else None
+
+    def rows_with_columns():
+        for row in rows:
+            row = added_values + row
+            for idx, value in overwrite:
+                row[idx] = value
+            if source_idx is not None:
+                row[pid_idx] = row[source_idx]
+            yield row
+
+    return new_headers, rows_with_columns()
+
+
+def write_rows(rows, f):
+    for row in rows:
+        f.write("\t".join(row) + "\n")
+        yield row
+
+
+def validate_rows(headers, rows, file_name):
+    """
+    Validate each row as it passes, printing any errors immediately.
+    Yields tuples of: line number in the SSF, the SSF entry, number of errors in the entry.
+    """
+    for line_num, row in enumerate(rows, start=2):
+        ssf_entry = dict(zip(headers, row))
+        n_errors = validate_ssf_entry(ssf_entry, len(headers), 0, line_num, file_name)
+        sys.stdout.flush()
+        yield line_num, ssf_entry, n_errors
+
+
+def run_pipeline(headers, rows, ssf_path, tsv_path, buffer_size=1000):
+    """
+    Write the SSF and the eager TSV from a stream of SSF rows. Entries that fail validation are written to the SSF, but
+    left out of the TSV. Returns the total number of errors.
+    Both files are written to temporary files next to their destination, which only replace it once every row has been
+    written. If the stream fails part-way, the temporary files are removed and existing outputs are left untouched.
+    """
+    file_name = os.path.basename(ssf_path)
+    check_ssf_header(headers, file_name, REQUIRED_FIELDS)
+    builder = eager_input.EagerRowBuilder()
+    error_counter = 0
+    n_rows = 0
+    tmp_ssf_path, tmp_tsv_path = f"{ssf_path}.tmp", f"{tsv_path}.tmp"
+    try:
+        with open(tmp_ssf_path, "w") as ssf_out, open(tmp_tsv_path, "w") as tsv_out:
+            ssf_out.write("\t".join(headers) + "\n")
+            tsv_out.write("\t".join(eager_input.EAGER_TSV_HEADER) + "\n")
+            for line_num, ssf_entry, n_errors in validate_rows(
+                headers, write_rows(prefetch(rows, buffer_size), ssf_out), file_name
+            ):
+                n_rows += 1
+                error_counter += n_errors
+                if n_errors > 0:
+                    continue
+                try:
+                    tsv_out.writelines("\t".join(row) + "\n" for row in builder.rows(ssf_entry))
+                except ValueError as e:
+                    error_counter = print_error(str(e), "Line", line_num, error_counter, file_name)
+        os.replace(tmp_ssf_path, ssf_path)
+        os.replace(tmp_tsv_path, tsv_path)
+    except BaseException:
+        for path in [tmp_ssf_path, tmp_tsv_path]:
+            if os.path.exists(path):
+                os.remove(path)
+        raise
+
+    log(f"Wrote {n_rows} rows to '{ssf_path}' and {sum(builder.lanes.values())} rows to '{tsv_path}'.")
+    ## Print warning if there are lines with missing FastQ files
+    if builder.missing_fastq_count > 0:
+        log(
+            f"WARNING: There are {builder.missing_fastq_count} entries in the SSF file without a FastQ file. Using submitted BAM instead."
+        )
+    if builder.submitted_is_not_bam_count > 0:
+        log(
+            f"WARNING: There are {builder.submitted_is_not_bam_count} entries in the SSF file without a FastQ file or BAM file. These entries have been ignored."
+        )
+    return error_counter
+
+
+def parse_args(args=None):
+    Description = (
+        "Create the SSF and nf-core/eager TSV of a package recipe directly from an ENA or GSA project accession, "
+        "validating the SSF while it is downloaded."
+    )
+    Epilog = "Example usage: python create_recipe_from_accession.py PRJEB39316 2020_Margaryan_Viking --udg half --library_built ds --poseidon_ids_from sample_alias"
+
+    parser = argparse.ArgumentParser(description=Description, epilog=Epilog)
+    parser.add_argument("accession", help="ENA (e.g. PRJEB39316) or GSA (e.g. HRA008755) project accession.")
+    parser.add_argument("package_name", help="Name of the package. Used to name the SSF and TSV files.")
+    parser.add_argument("--archive", choices=["ena", "gsa"], default="ena", help="Archive the project is in. Default: ena")
+    parser.add_argument("-o", "--output_dir", help="Directory to write the SSF and TSV to. Default: packages/<package_name>")
+    parser.add_argument("--udg", choices=["minus", "half", "plus"], help="Value to fill the udg column with.")
+    parser.add_argument("--library_built", choices=["ds", "ss"], help="Value to fill the library_built column with.")
+    parser.add_argument("--poseidon_ids_from", help="Column to copy poseidon_IDs from (e.g. sample_alias).")
+    parser.add_argument("--buffer_size", type=int, default=1000, help="Maximum number of downloaded rows waiting to be processed. Default: 1000")
+    parser.add_argument("--retries", type=int, default=5, help="Number of times to retry opening the connection to the ENA. Default: 5")
+    parser.add_argument("--timeout", type=float, default=300, help="Timeout in seconds for the ENA connection to go quiet. Default: 300")
+    parser.add_argument("--ena_url", default=ENA_FILEREPORT_URL, help="Base URL of the ENA filereport API. Only useful for testing against a local stand-in server.")
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    args = parse_args(args)
+    output_dir = args.output_dir
+    if output_dir is None:
+        output_dir = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "packages", args.package_name)
+    os.makedirs(output_dir, exist_ok=True)
+    ssf_path = os.path.join(output_dir, f"{args.package_name}.ssf")
+    tsv_path = os.path.join(output_dir, f"{args.package_name}.tsv")
+
+    try:
+        if args.archive == "ena":
+            headers, rows = fetch_ena_rows(args.accession, args.ena_url, max(args.retries, 0), args.timeout)
+        else:
+            headers, rows = fetch_gsa_rows(args.accession)
+        headers, rows = inject_columns(
+            headers, rows, {"udg": args.udg, "library_built": args.library_built}, args.poseidon_ids_from
+        )
+        error_counter = run_pipeline(headers, rows, ssf_path, tsv_path, max(args.buffer_size, 1))
+    except (urllib.error.URLError, http.client.HTTPException, OSError, RuntimeError, ValueError) as e:
+        log(f"ERROR: {e}. No SSF or TSV was written.")
+        return 1
+
+    ## Keep track of versions
+    with open(os.path.join(output_dir, "script_versions.txt"), "w") as f:
+        f.write(f"{os.path.basename(__file__)}:\t{VERSION}\n")
+        f.write(f"eager_input.py for initial TSV:\t{eager_input.VERSION}\n")
+
+    if error_counter > 0:
+        print(
+            "[Formatting check] [File: {}] {} formatting error(s) were detected in the input file. Entries with errors were left out of '{}'. Please fix the SSF and recreate the TSV.".format(
+                os.path.basename(ssf_path), error_counter, os.path.basename(tsv_path)
+            )
+        )
+        return 1
+    print(
+        "[Formatting check] [File: {}] No formatting errors were detected in the input file.".format(
+            os.path.basename(ssf_path)
+        )
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    print("[create_recipe_from_accession.py]: version {}".format(VERSION), file=sys.stderr)
+    sys.exit(main())
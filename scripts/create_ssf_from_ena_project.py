@@ -3,7 +3,14 @@
 ## Script originally made by Stephan Schiffels (@stschiff). Edited by Thiseas C. Lamnidis (@TCLamnidis) for specific use in this repository (added empty poseidon_IDs, udg and library_built columns).
 
 import argparse
+import concurrent.futures
+import http.client
+import json
+import os
+import shutil
 import sys
+import time
+import urllib.error
 import urllib.request
 
 
@@ -41,16 +48,7 @@ def add_columns_to_ena_table(ena_table_lines, column_names=None, column_value=No
     
     return l
 
-parser = argparse.ArgumentParser(
-    prog = 'get_ena_table',
-    description = 'This script downloads a table with '
-                    'links to the raw data and metadata provided by '
-                    'ENA for a given project accession ID')
-
-parser.add_argument('accession_id', help="Example: PRJEB39316")
-parser.add_argument('-o', '--output_file', required=True, help="The name of the output file")
-
-args = parser.parse_args()
+ENA_FILEREPORT_URL = "https://www.ebi.ac.uk/ena/portal/api/filereport"
 
 ena_cols = [
     "sample_accession", 
@@ -77,26 +75,280 @@ ena_cols = [
 
 additional_cols = ["poseidon_IDs", "udg", "library_built", "notes"]
 
-ena_col_str = ",".join(ena_cols)
+## HTTP status codes worth retrying. Any other HTTP error (e.g. an unknown accession) will not go away on retry.
+RETRYABLE_HTTP_CODES = [408, 429, 500, 502, 503, 504]
+
+
+def log(message):
+    print(f"[create_ssf_from_ena_project.py] {message}", file=sys.stderr)
+
+
+def filereport_url(accession_id, limit=0, offset=0, base_url=ENA_FILEREPORT_URL, fields=None):
+    ena_col_str = ",".join(ena_cols if fields is None else fields)
+    url = f"{base_url}?accession={accession_id}&result=read_run&fields={ena_col_str}&format=tsv&limit={limit}"
+    if offset > 0:
+        url += f"&offset={offset}"
+    return url
+
+
+def with_retries(request, retries=0):
+    """
+    Call `request()` and return its result, retrying on connection errors and transient server errors with exponential backoff.
+    """
+    for attempt in range(retries + 1):
+        try:
+            return request()
+        except urllib.error.HTTPError as e:
+            if e.code not in RETRYABLE_HTTP_CODES or attempt == retries:
+                raise
+            error = e
+        except (urllib.error.URLError, http.client.HTTPException, OSError) as e:
+            if attempt == retries:
+                raise
+            error = e
+        wait = 2**attempt
+        log(f"Request failed ({error}). Retrying in {wait}s ({attempt + 1}/{retries}).")
+        time.sleep(wait)
+
+
+def fetch_filereport(url, retries=0, timeout=None, check_complete=False):
+    """
+    Download a filereport, retrying on connection errors and transient server errors with exponential backoff.
+    With check_complete, a table that does not end in a newline is treated as a dropped connection.
+    Returns the lines of the table (as bytes) and the byte encoding reported by the server (utf-8 if none is given).
+    """
+
+    def request():
+        with urllib.request.urlopen(url, timeout=timeout) as result:
+            ## Try to infer byte encoding from the server. if not provided use utf-8 as default.
+            byte_encoding = result.headers.get_content_charset()
+            if byte_encoding is None:
+                byte_encoding = "utf-8"
+            l = result.readlines()
+        ## ENA tables always end in a newline, so anything else means the connection dropped mid-table.
+        if check_complete and l and not l[-1].endswith(b"\n"):
+            raise http.client.IncompleteRead(l[-1])
+        return l, byte_encoding
+
+    return with_retries(request, retries)
+
+
+def run_accessions(lines, byte_encoding="utf-8"):
+    """
+    Return the run accessions in a filereport table, given as the lines of the table (as bytes).
+    """
+    if not lines:
+        return []
+    headers = lines[0].decode(byte_encoding).rstrip("\r\n").split("\t")
+    if "run_accession" not in headers:
+        raise ValueError("The ENA table has no run_accession column.")
+    run_idx = headers.index("run_accession")
+    return [line.decode(byte_encoding).rstrip("\r\n").split("\t")[run_idx] for line in lines[1:]]
+
+
+def fetch_run_accessions(accession_id, base_url, retries, timeout):
+    """
+    Download only the run accessions of the whole filereport, as an independent record of the rows the table should have.
+    """
+    url = filereport_url(accession_id, base_url=base_url, fields=["run_accession"])
+    l, byte_encoding = fetch_filereport(url, retries=retries, timeout=timeout, check_complete=True)
+    return run_accessions(l, byte_encoding)
+
+
+def check_pages(checkpoint_dir, n_pages, page_size, expected_runs, byte_encoding):
+    """
+    Check the downloaded pages against the run accessions of the whole table. This catches pages that were cut short at a
+    line boundary (which look like a complete response), and servers that ignore or reorder the offset of a page.
+    """
+    seen = {}
+    for page_idx in range(n_pages):
+        with open(page_path(checkpoint_dir, page_idx), "rb") as page:
+            runs = run_accessions(page.readlines(), byte_encoding)
+        expected_rows = min(page_size, len(expected_runs) - page_idx * page_size)
+        if len(runs) != expected_rows:
+            raise ValueError(
+                f"Page {page_idx} has {len(runs)} rows, but {expected_rows} were expected for a table of {len(expected_runs)} rows."
+            )
+        for run in runs:
+            if run in seen:
+                raise ValueError(f"Run '{run}' is in both page {seen[run]} and page {page_idx}.")
+            seen[run] = page_idx
+    missing = set(expected_runs).difference(seen)
+    if missing:
+        raise ValueError(f"{len(missing)} run(s) of the table are missing from the downloaded pages (e.g. '{min(missing)}').")
+
+
+def page_path(checkpoint_dir, page_idx):
+    return os.path.join(checkpoint_dir, f"page_{page_idx:06d}.tsv")
+
+
+def count_page_rows(path):
+    with open(path, "rb") as f:
+        ## The first line of each page is the table header.
+        return max(sum(1 for _ in f) - 1, 0)
+
+
+def prepare_checkpoint_dir(checkpoint_dir, accession_id, page_size):
+    """
+    Create the checkpoint directory, or check that an existing one belongs to the same download.
+    Returns the number of data rows in each page that was already downloaded, keyed by page index.
+    """
+    manifest = {"accession_id": accession_id, "fields": ena_cols, "page_size": page_size}
+    manifest_path = os.path.join(checkpoint_dir, "manifest.json")
+    if os.path.exists(manifest_path):
+        with open(manifest_path) as f:
+            if json.load(f) != manifest:
+                raise ValueError(
+                    f"Checkpoint directory '{checkpoint_dir}' belongs to a different download (accession, fields or page size differ). Remove it or use a different --checkpoint_dir."
+                )
+    else:
+        os.makedirs(checkpoint_dir, exist_ok=True)
+        with open(manifest_path, "w") as f:
+            json.dump(manifest, f)
+
+    completed = {}
+    for fn in os.listdir(checkpoint_dir):
+        if fn.startswith("page_") and fn.endswith(".tsv"):
+            completed[int(fn[len("page_") : -len(".tsv")])] = count_page_rows(os.path.join(checkpoint_dir, fn))
+    return completed
 
-url = f"https://www.ebi.ac.uk/ena/portal/api/filereport?accession={args.accession_id}&\
-result=read_run&fields={ena_col_str}&format=tsv&limit=0"
 
-# print(url)
-print(f"[create_ssf_from_ena_project.py] Attempting to download the ENA table using the following URL: {url}", file=sys.stderr)
+def fetch_page(accession_id, page_idx, page_size, checkpoint_dir, base_url, retries, timeout):
+    """
+    Download one page of the filereport and checkpoint it. Returns the number of data rows in the page.
+    """
+    url = filereport_url(accession_id, limit=page_size, offset=page_idx * page_size, base_url=base_url)
+    l, byte_encoding = fetch_filereport(url, retries=retries, timeout=timeout, check_complete=True)
+    ## Write to a temporary file first, so an interrupted write is never mistaken for a finished page.
+    path = page_path(checkpoint_dir, page_idx)
+    with open(path + ".tmp", "wb") as f:
+        f.writelines(l)
+    os.replace(path + ".tmp", path)
+    return max(len(l) - 1, 0), byte_encoding
 
-result = urllib.request.urlopen(url)
 
-## Try to infer byte encoding from the server. if not provided use utf-8 as default.
-byte_encoding = result.headers.get_content_charset()
-if byte_encoding is None:
+def download_paged_table(accession_id, output_file, page_size, threads, checkpoint_dir, base_url, retries, timeout):
+    """
+    Download the filereport in pages of `page_size` rows, with up to `threads` pages in flight at once.
+    Every finished page is checkpointed in `checkpoint_dir`, and pages that are already there are not downloaded again.
+    The number of pages comes from the run accessions of the whole table, which are downloaded first in a single small
+    request. Once all pages are present and agree with those run accessions, they are assembled in order into the output
+    SSF and the checkpoint directory is removed.
+    """
+    completed = prepare_checkpoint_dir(checkpoint_dir, accession_id, page_size)
+    if completed:
+        log(f"Resuming download from '{checkpoint_dir}' ({len(completed)} page(s) already downloaded).")
+    expected_runs = fetch_run_accessions(accession_id, base_url, retries, timeout)
+    ## A table of 0 rows still has one (empty) page.
+    last_page = max((len(expected_runs) + page_size - 1) // page_size - 1, 0)
+    log(f"The table has {len(expected_runs)} rows, to be downloaded in {last_page + 1} page(s).")
     byte_encoding = "utf-8"
 
-with result:
-    l = result.readlines()
+    next_page = 0
+    pending = {}
+    failed = {}
+    with concurrent.futures.ThreadPoolExecutor(max_workers=threads) as pool:
+
+        def schedule():
+            nonlocal next_page
+            ## No new pages are started past the end of the table, or past a page that failed.
+            while len(pending) < threads and next_page <= last_page and (not failed or next_page < min(failed)):
+                if next_page not in completed:
+                    future = pool.submit(
+                        fetch_page, accession_id, next_page, page_size, checkpoint_dir, base_url, retries, timeout
+                    )
+                    pending[future] = next_page
+                next_page += 1
+
+        schedule()
+        while pending:
+            finished, _ = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in finished:
+                page_idx = pending.pop(future)
+                try:
+                    n_rows, page_encoding = future.result()
+                except Exception as e:
+                    ## Keep going, so the pages in flight still get checkpointed.
+                    failed[page_idx] = e
+                    continue
+                completed[page_idx] = n_rows
+                if page_encoding != "utf-8":
+                    byte_encoding = page_encoding
+                log(f"Downloaded page {page_idx} ({n_rows} rows).")
+            schedule()
+
+    if failed:
+        page_idx = min(failed)
+        raise RuntimeError(
+            f"Failed to download page {page_idx} ({failed[page_idx]}). Rerun the same command to resume from the last finished page."
+        ) from failed[page_idx]
+    try:
+        check_pages(checkpoint_dir, last_page + 1, page_size, expected_runs, byte_encoding)
+    except ValueError as e:
+        raise ValueError(
+            f"The downloaded pages do not add up to the table: {e} The table may have changed during the download, or the server does not page it consistently. Remove '{checkpoint_dir}' to download all pages again."
+        ) from e
+
+    header = None
+    with open(output_file, "wb") as f:
+        for page_idx in range(last_page + 1):
+            with open(page_path(checkpoint_dir, page_idx), "rb") as page:
+                l = page.readlines()
+            if not l:
+                continue
+            page_header = l[0]
+            if header is not None and l[0] != header:
+                raise ValueError(f"The header of page {page_idx} does not match the header of the first page.")
+            l = add_columns_to_ena_table(l, column_names = additional_cols, column_value = "n/a", byte_encoding = byte_encoding)
+            ## Every page starts with the table header, but only the first one goes in the output.
+            f.writelines(l if header is None else l[1:])
+            if header is None:
+                header = page_header
+    shutil.rmtree(checkpoint_dir)
+    log(f"Assembled {sum(completed[idx] for idx in range(last_page + 1))} rows from {last_page + 1} page(s) into '{output_file}'.")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog = 'get_ena_table',
+        description = 'This script downloads a table with '
+                        'links to the raw data and metadata provided by '
+                        'ENA for a given project accession ID')
+
+    parser.add_argument('accession_id', help="Example: PRJEB39316")
+    parser.add_argument('-o', '--output_file', required=True, help="The name of the output file")
+    parser.add_argument('--page_size', type=int, default=0, help="Download the table in pages of this many rows. Finished pages are checkpointed, so an interrupted download can be resumed by rerunning the same command. Default: 0 (download the whole table in a single request)")
+    parser.add_argument('--threads', type=int, default=4, help="Number of pages to download in parallel when --page_size is set. Default: 4")
+    parser.add_argument('--checkpoint_dir', help="Directory to keep finished pages in when --page_size is set. Default: <output_file>.pages")
+    parser.add_argument('--retries', type=int, default=5, help="Number of times to retry a failed request when --page_size is set. Default: 5")
+    parser.add_argument('--timeout', type=float, default=300, help="Timeout in seconds for each request when --page_size is set. Default: 300")
+    parser.add_argument('--ena_url', default=ENA_FILEREPORT_URL, help="Base URL of the ENA filereport API. Only useful for testing against a local stand-in server.")
+
+    args = parser.parse_args()
+
+    if args.page_size > 0:
+        checkpoint_dir = args.checkpoint_dir if args.checkpoint_dir else f"{args.output_file}.pages"
+        log(f"Attempting to download the ENA table in pages of {args.page_size} rows using the following URL: {filereport_url(args.accession_id, limit=args.page_size, base_url=args.ena_url)}")
+        try:
+            download_paged_table(args.accession_id, args.output_file, args.page_size, max(args.threads, 1), checkpoint_dir, args.ena_url, args.retries, args.timeout)
+        except (RuntimeError, ValueError) as e:
+            log(f"ERROR: {e}")
+            sys.exit(1)
+        return
+
+    url = filereport_url(args.accession_id, base_url=args.ena_url)
+
+    # print(url)
+    log(f"Attempting to download the ENA table using the following URL: {url}")
+
+    l, byte_encoding = fetch_filereport(url)
     ## Add additional columns to the pulled table
     ##   result.headers.get_content_charset() can be used to get the encoding used from the URL server, however the ENA does not provide that. If provided use that instead of utf-8
     l = add_columns_to_ena_table(l, column_names = additional_cols, column_value = "n/a", byte_encoding = byte_encoding)
 
-with open(args.output_file, "wb") as f:
-    f.writelines(l)
+    with open(args.output_file, "wb") as f:
+        f.writelines(l)
+
+
+if __name__ == "__main__":
+    main()
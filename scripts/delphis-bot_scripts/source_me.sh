@@ -1,6 +1,6 @@
 #!/usr/bin/env bash
 
-HELPER_FUNCTION_VERSION='0.5.2'
+HELPER_FUNCTION_VERSION='0.5.3'
 
 ## Print coloured messages to stderr
 #   errecho -r will print in red
@@ -307,9 +307,9 @@ function infer_colour_chemistry() {
   if [[ ${platform} != "ILLUMINA" ]]; then
     check_fail 5 "Colour chemistry inference only works for ILLUMINA sequencing platforms, not '${platform}'."
   else
-    if   [[ $(get_index_of "${model}" "${four_chem_seqs[@]}") != '' ]]; then
+    if   [[ $(get_index_of "${model}" "${four_chem_seqs[@]}") != '-1' ]]; then
       colour_chemistry="4"
-    elif [[ $(get_index_of "${model}" "${two_chem_seqs[@]}") != '' ]]; then
+    elif [[ $(get_index_of "${model}" "${two_chem_seqs[@]}") != '-1' ]]; then
       colour_chemistry="2"
     else
       check_fail 5 "Illumina model '${model}' not recognised. Please ensure your instrument model is in an ENA-approved format"
@@ -0,0 +1,207 @@
+#!/usr/bin/env python
+
+## Python counterpart of `delphis-bot_scripts/create_eager_input.sh` and its helper functions in `source_me.sh`.
+##   Turns SSF entries into rows of the precursor nf-core/eager (v2.*) TSV one at a time, so it can be used on a stream of
+##   SSF entries without writing the SSF to disk first. Run on its own, it writes the same TSV as `create_eager_input.sh`
+##   for an SSF on disk, which `testing/test_eager_input_parity.sh` uses to keep the two implementations in sync.
+
+VERSION = "0.1.2"
+
+import os
+import re
+import sys
+import argparse
+
+from ssf_validator import FOUR_CHEM_SEQS, TWO_CHEM_SEQS, read_ssf_file
+
+EAGER_TSV_HEADER = [
+    "Sample_Name",
+    "Library_ID",
+    "Lane",
+    "Colour_Chemistry",
+    "SeqType",
+    "Organism",
+    "Strandedness",
+    "UDG_Treatment",
+    "R1",
+    "R2",
+    "BAM",
+    "R1_target_file",
+    "R2_target_file",
+    "BAM_target",
+]
+ORGANISM = "Homo sapiens (modern human)"
+RAW_DATA_DUMMY_PATH = "<PATH_TO_DATA>"
+
+
+def infer_colour_chemistry(platform, model):
+    if platform != "ILLUMINA":
+        raise ValueError(
+            "Colour chemistry inference only works for ILLUMINA sequencing platforms, not '{}'.".format(platform)
+        )
+    if model in FOUR_CHEM_SEQS:
+        return "4"
+    elif model in TWO_CHEM_SEQS:
+        return "2"
+    raise ValueError(
+        "Illumina model '{}' not recognised. Please ensure your instrument model is in an ENA-approved format".format(model)
+    )
+
+
+def infer_library_udg(value, index=0):
+    values = value.split(";")
+    udg = {"minus": "none", "half": "half", "plus": "full"}
+    ## Mixed cannot be deconstructed. Assume UDG none as that is most conservative.
+    if len(values) == 1 and values[0] == "mixed":
+        return "none"
+    entry = values[0] if len(values) == 1 else values[index]
+    if entry not in udg:
+        raise ValueError("Unrecognised UDG_Treatment value: '{}' in entry '{}'".format(entry, value))
+    return udg[entry]
+
+
+def infer_library_strandedness(value, index=0):
+    values = value.split(";")
+    strandedness = {"ds": "double", "ss": "single"}
+    ## Other cannot be deconstructed. Assuming double stranded since that is more conservative when genotyping (everything trimmed)
+    if len(values) == 1 and values[0] == "other":
+        return "double"
+    entry = values[0] if len(values) == 1 else values[index]
+    if entry not in strandedness:
+        raise ValueError("Unrecognised Library_Built value: '{}' in entry '{}'".format(entry, value))
+    return strandedness[entry]
+
+
+def fastq_entries(fastq_ftp):
+    return [entry for entry in fastq_ftp.split(";") if entry]
+
+
+def r1_r2_from_ena_fastq(fastq_ftp, submitted_ftp):
+    """
+    Returns a quadruple of: seq_type R1 R2 BAM, with the basenames of the archive files each column will link to.
+    """
+    entries = fastq_entries(fastq_ftp)
+    r1, r2, bam = "NA", "NA", "NA"
+    if fastq_ftp == "n/a" or len(entries) == 0:
+        ## If there are no entries, then use the BAM (assumed SE). This ensures we pull the BAM when a bai is also provided.
+        bam = os.path.basename(submitted_ftp.split(";")[0])
+        seq_type = "SE"
+    elif len(entries) == 2:
+        r1, r2 = os.path.basename(entries[0]), os.path.basename(entries[1])
+        seq_type = "PE"
+    elif len(entries) in [1, 3]:
+        ## With three entries, it is a BAM with collapsed reads, so keep only merged reads (treat as SE).
+        r1 = os.path.basename(entries[0])
+        seq_type = "SE"
+    else:
+        raise ValueError("Unexpected number of entries in fastq_ftp field: {}.".format(fastq_ftp))
+    return seq_type, r1, r2, bam
+
+
+def dummy_r1_r2_from_ena_fastq(prefix, out_fn_prefix, fastq_ftp):
+    """
+    Returns a quadruple of: seq_type R1 R2 BAM, with the dummy paths the downloaded files will be symlinked to.
+    """
+    entries = fastq_entries(fastq_ftp)
+    r1, r2, bam = "{}/{}_R1.fastq.gz".format(prefix, out_fn_prefix), "NA", "NA"
+    if fastq_ftp == "n/a" or len(entries) == 0:
+        r1 = "NA"
+        bam = "{}/{}.bam".format(prefix, out_fn_prefix)
+        seq_type = "SE"
+    elif len(entries) == 2:
+        r2 = "{}/{}_R2.fastq.gz".format(prefix, out_fn_prefix)
+        seq_type = "PE"
+    elif len(entries) in [1, 3]:
+        seq_type = "SE"
+    else:
+        raise ValueError("Unexpected number of entries in fastq_ftp field: {}.".format(fastq_ftp))
+    return seq_type, r1, r2, bam
+
+
+class EagerRowBuilder:
+    """
+    Builds eager TSV rows from SSF entries. Only the number of lanes seen per library is kept between entries.
+    """
+
+    def __init__(self, raw_data_dummy_path=RAW_DATA_DUMMY_PATH):
+        self.raw_data_dummy_path = raw_data_dummy_path
+        self.lanes = {}
+        self.missing_fastq_count = 0
+        self.submitted_is_not_bam_count = 0
+
+    def rows(self, ssf_entry):
+        """
+        Return the eager TSV rows (lists of strings) for a single SSF entry.
+        One set of sequencing data can correspond to multiple poseidon_ids, so one entry can give multiple rows.
+        """
+        fastq_fn = ssf_entry["fastq_ftp"]
+        submitted_fn = ssf_entry.get("submitted_ftp", "")
+        if fastq_fn in ["", "n/a"] and re.search(r"\.(bam|bai)$", submitted_fn):
+            ## These entries get the BAM picked up so they can be converted within eager.
+            self.missing_fastq_count += 1
+        elif fastq_fn == "":
+            ## Entries without a FastQ file, where the submitted file is not BAM, are skipped.
+            self.submitted_is_not_bam_count += 1
+            return []
+
+        colour_chemistry = infer_colour_chemistry(ssf_entry["instrument_platform"], ssf_entry["instrument_model"])
+        library_built = infer_library_strandedness(ssf_entry["library_built"])
+        udg_treatment = infer_library_udg(ssf_entry["udg"])
+        ## Add _ss suffix to sample_name (and later library_id) if single stranded (data never gets merged with double stranded data in eager).
+        strandedness_suffix = "_ss" if library_built == "single" else ""
+
+        rows = []
+        for poseidon_id in ssf_entry["poseidon_IDs"].split(";"):
+            row_pid = poseidon_id + strandedness_suffix
+            row_lib_id = "{}_{}{}".format(row_pid, ssf_entry["library_name"], strandedness_suffix)
+            lane = self.lanes.get(row_lib_id, 0) + 1
+            self.lanes[row_lib_id] = lane
+
+            seq_type, r1, r2, bam = dummy_r1_r2_from_ena_fastq(
+                self.raw_data_dummy_path, "{}_L{}".format(row_lib_id, lane), fastq_fn
+            )
+            _, r1_target, r2_target, bam_target = r1_r2_from_ena_fastq(fastq_fn, submitted_fn)
+            rows.append(
+                [
+                    row_pid,
+                    row_lib_id,
+                    str(lane),
+                    colour_chemistry,
+                    seq_type,
+                    ORGANISM,
+                    library_built,
+                    udg_treatment,
+                    r1,
+                    r2,
+                    bam,
+                    r1_target,
+                    r2_target,
+                    bam_target,
+                ]
+            )
+        return rows
+
+
+def parse_args(args=None):
+    Description = "Create the nf-core/eager (v2.*) TSV of an SSF file, like `create_eager_input.sh` does for a package."
+    Epilog = "Example usage: python eager_input.py <FILE_IN> -o <FILE_OUT>"
+
+    parser = argparse.ArgumentParser(description=Description, epilog=Epilog)
+    parser.add_argument("FILE_IN", help="Input SSF file.")
+    parser.add_argument("-o", "--output_file", required=True, help="The name of the output TSV file.")
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    args = parse_args(args)
+    builder = EagerRowBuilder()
+    with open(args.FILE_IN, "r") as fin, open(args.output_file, "w") as fout:
+        fout.write("\t".join(EAGER_TSV_HEADER) + "\n")
+        for ssf_entry in read_ssf_file(fin):
+            fout.writelines("\t".join(row) + "\n" for row in builder.rows(ssf_entry))
+    return 0
+
+
+if __name__ == "__main__":
+    print("[eager_input.py]: version {}".format(VERSION), file=sys.stderr)
+    sys.exit(main())
@@ -0,0 +1,390 @@
+#!/usr/bin/env python
+
+## Binary columnar cache of parsed SSF files.
+##   Each SSF gets a sidecar file (`<name>.ssf.ssfc`) holding the already-split columns of the SSF. Columns with few
+##   distinct values (e.g. instrument_model, udg, library_layout) are dictionary-encoded, all other columns are stored as
+##   one utf-8 blob plus an offsets array. The sidecar is opened through mmap, so columns can be accessed without copying
+##   or re-parsing the text, and it is invalidated whenever the sha256 of the SSF contents changes.
+##   The cache only pays off for column access (see `benchmark_ssf_cache.py`), so it is a library for such readers, which
+##   open it through `load_ssf`. Tools that walk SSFs row by row (e.g. `ssf_validator.py`) keep parsing the text.
+
+VERSION = "1.2.0"
+
+import os
+import sys
+import mmap
+import json
+import array
+import struct
+import hashlib
+import argparse
+import tempfile
+
+CACHE_SUFFIX = ".ssfc"
+MAGIC = b"SSFC"
+FORMAT_VERSION = 3
+## magic, format version, sha256 digest of the SSF, number of rows, number of columns, length of the JSON metadata block,
+##   total size of the cache file, sha256 digest of everything else in the cache (see `_payload_digest`)
+PREAMBLE = struct.Struct("<4sH32sIIQQ32s")
+DIGEST_SIZE = 32
+ALIGNMENT = 8
+MAX_DICT_SIZE = 65535  ## Dictionary codes are stored as at most 2-byte unsigned integers.
+
+
+def cache_path_for(ssf_path):
+    return "{}{}".format(ssf_path, CACHE_SUFFIX)
+
+
+def ssf_digest(ssf_path, chunk_size=1 << 20):
+    """
+    Return the sha256 digest of the raw bytes of an SSF file.
+    """
+    digest = hashlib.sha256()
+    with open(ssf_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.digest()
+
+
+def _payload_digest(cache):
+    """
+    Return the sha256 digest of a cache file's contents, given as bytes-like, covering the preamble fields before the digest
+    itself and everything after the preamble.
+    """
+    digest = hashlib.sha256(cache[: PREAMBLE.size - DIGEST_SIZE])
+    digest.update(cache[PREAMBLE.size :])
+    return digest.digest()
+
+
+def parse_ssf_lines(lines):
+    """
+    Split the lines of an SSF file into its header and rows, the same way `read_ssf_file` does.
+    """
+    headers = lines[0].split()
+    rows = [row.strip().split("\t") for row in lines[1:]]
+    return headers, rows
+
+
+def _pad(buffer):
+    buffer.extend(b"\0" * (-len(buffer) % ALIGNMENT))
+
+
+def _encode_column(values, n_rows):
+    """
+    Return the metadata entry and the buffers of a single column.
+    Columns with few distinct values are dictionary-encoded, the rest are stored as a utf-8 blob with row offsets.
+    """
+    distinct = list(dict.fromkeys(values))
+    if len(distinct) <= MAX_DICT_SIZE and len(distinct) <= max(1, n_rows // 2):
+        code_of = {value: code for code, value in enumerate(distinct)}
+        codes = array.array("B" if len(distinct) <= 256 else "H", [code_of[v] for v in values])
+        return {"encoding": "dict", "values": distinct, "typecode": codes.typecode}, [codes.tobytes()]
+
+    encoded = [v.encode("utf-8") for v in values]
+    offsets = array.array("I", [0])
+    total = 0
+    for value in encoded:
+        total += len(value)
+        offsets.append(total)
+    return {"encoding": "plain", "typecode": offsets.typecode}, [offsets.tobytes(), b"".join(encoded)]
+
+
+def write_ssf_cache(ssf_path, headers, rows, digest=None):
+    """
+    Write the columnar sidecar of an SSF file, given its parsed header and rows.
+    Returns the path of the sidecar, or None if the SSF cannot be represented as a table (ragged rows), in which case
+    readers should fall back to the text file.
+    """
+    if any(len(row) != len(headers) for row in rows):
+        return None
+    if digest is None:
+        digest = ssf_digest(ssf_path)
+    n_rows = len(rows)
+
+    columns = []
+    buffers = []
+    for col_idx, name in enumerate(headers):
+        meta, column_buffers = _encode_column([row[col_idx] for row in rows], n_rows)
+        meta["name"] = name
+        columns.append(meta)
+        buffers.append(column_buffers)
+    ## Offsets are only known once the size of the metadata block is fixed, so reserve their slots with placeholders and
+    ##   iterate until the metadata length stops changing (it can only grow by a few digits).
+    for meta, column_buffers in zip(columns, buffers):
+        meta["buffers"] = [[0, len(b)] for b in column_buffers]
+    meta_json = b""
+    while True:
+        start = PREAMBLE.size + len(meta_json)
+        start += -start % ALIGNMENT
+        position = start
+        for meta, column_buffers in zip(columns, buffers):
+            for slot, b in zip(meta["buffers"], column_buffers):
+                slot[0] = position
+                position += len(b) + (-len(b) % ALIGNMENT)
+        new_meta_json = json.dumps(
+            {"headers": headers, "byteorder": sys.byteorder, "columns": columns}
+        ).encode("utf-8")
+        done = len(new_meta_json) == len(meta_json)
+        meta_json = new_meta_json
+        if done:
+            break
+    if position > 0xFFFFFFFF:
+        return None
+
+    out = bytearray(
+        PREAMBLE.pack(MAGIC, FORMAT_VERSION, digest, n_rows, len(headers), len(meta_json), position, bytes(DIGEST_SIZE))
+    )
+    out.extend(meta_json)
+    _pad(out)
+    for column_buffers in buffers:
+        for b in column_buffers:
+            out.extend(b)
+            _pad(out)
+    out[PREAMBLE.size - DIGEST_SIZE : PREAMBLE.size] = _payload_digest(out)
+
+    ## Write to a temporary file first, so concurrent readers never see a partial cache.
+    cache_path = cache_path_for(ssf_path)
+    fd, tmp_path = tempfile.mkstemp(
+        prefix=".{}.".format(os.path.basename(cache_path)), dir=os.path.dirname(os.path.abspath(cache_path))
+    )
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(out)
+        os.replace(tmp_path, cache_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return cache_path
+
+
+class DictColumn:
+    """
+    A dictionary-encoded column. `codes` is a zero-copy view into the cache, `values` holds each distinct value once.
+    """
+
+    def __init__(self, codes, values):
+        self.codes = codes
+        self.values = values
+
+    def __len__(self):
+        return len(self.codes)
+
+    def __getitem__(self, idx):
+        return self.values[self.codes[idx]]
+
+    def __iter__(self):
+        values = self.values
+        return (values[code] for code in self.codes)
+
+
+class PlainColumn:
+    """
+    A column stored as a single utf-8 blob. `raw(idx)` returns a zero-copy view of the encoded value.
+    """
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def raw(self, idx):
+        return self.data[self.offsets[idx] : self.offsets[idx + 1]]
+
+    def __getitem__(self, idx):
+        return str(self.raw(idx), "utf-8")
+
+    def __iter__(self):
+        text = str(self.data, "utf-8")
+        offsets = self.offsets.tolist()
+        ## For ASCII-only columns byte offsets are also character offsets, so the whole column is decoded at once.
+        if len(text) == len(self.data):
+            return (text[start:end] for start, end in zip(offsets, offsets[1:]))
+        return (self[idx] for idx in range(len(self)))
+
+
+class SSFCache:
+    """
+    Memory-mapped view of a columnar SSF sidecar. Use as a context manager, or call `close()` when done.
+    """
+
+    def __init__(self, cache_path):
+        self.path = cache_path
+        self._mmap = None
+        self.columns = []
+        with open(cache_path, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._view = memoryview(self._mmap)
+            self._load()
+        except (ValueError, KeyError, IndexError, TypeError, struct.error) as e:
+            self.close()
+            raise ValueError("'{}' is not a valid SSF cache ({}).".format(cache_path, e)) from e
+        except BaseException:
+            self.close()
+            raise
+
+    def _load(self):
+        """
+        Parse the metadata and set up the column views. The whole file is checked against the digest stored in the
+        preamble, so that a truncated or otherwise damaged cache is rejected instead of returning wrong values, and every
+        buffer is checked against the size of the file.
+        """
+        size = len(self._view)
+        magic, version, self.digest, self.n_rows, n_cols, meta_len, file_size, payload_digest = PREAMBLE.unpack_from(
+            self._view
+        )
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError("not a version {} SSF cache".format(FORMAT_VERSION))
+        if file_size != size:
+            raise ValueError("expected {} bytes, found {}".format(file_size, size))
+        if _payload_digest(self._view) != payload_digest:
+            raise ValueError("contents do not match their checksum")
+        if PREAMBLE.size + meta_len > size:
+            raise ValueError("metadata runs past the end of the file")
+        meta = json.loads(bytes(self._view[PREAMBLE.size : PREAMBLE.size + meta_len]))
+        if meta["byteorder"] != sys.byteorder:
+            raise ValueError("written on a machine with a different byte order")
+        self.headers = meta["headers"]
+        if len(self.headers) != n_cols or [column["name"] for column in meta["columns"]] != self.headers:
+            raise ValueError("columns do not match the header")
+
+        for column in meta["columns"]:
+            buffers = []
+            for offset, length in column["buffers"]:
+                if not (isinstance(offset, int) and isinstance(length, int)) or offset < 0 or length < 0 or offset + length > size:
+                    raise ValueError("buffer of column '{}' lies outside the file".format(column["name"]))
+                buffers.append(self._view[offset : offset + length])
+            if column["encoding"] == "dict":
+                codes = buffers[0].cast(column["typecode"])
+                if len(codes) != self.n_rows or (self.n_rows > 0 and max(codes) >= len(column["values"])):
+                    raise ValueError("codes of column '{}' do not match its dictionary".format(column["name"]))
+                self.columns.append(DictColumn(codes, column["values"]))
+            else:
+                offsets = buffers[0].cast(column["typecode"])
+                data = buffers[1]
+                ## Offsets must never decrease, otherwise some values would silently come out empty.
+                offset_list = offsets.tolist()
+                if (
+                    len(offset_list) != self.n_rows + 1
+                    or offset_list[0] != 0
+                    or offset_list[-1] != len(data)
+                    or offset_list != sorted(offset_list)
+                ):
+                    raise ValueError("offsets of column '{}' are inconsistent".format(column["name"]))
+                self.columns.append(PlainColumn(offsets, data))
+        self._by_name = dict(zip(self.headers, self.columns))
+
+    def column(self, name):
+        return self._by_name[name]
+
+    def __len__(self):
+        return self.n_rows
+
+    def rows(self):
+        """
+        Yield each row as a list of values, in header order.
+        """
+        ## Decoding whole columns at once is much faster than indexing each column once per row.
+        for row in zip(*[list(column) for column in self.columns]):
+            yield list(row)
+
+    def close(self):
+        ## Views into the mmap must be released before the mmap itself can be closed.
+        for column in self.columns:
+            for attr in ("codes", "offsets", "data"):
+                view = getattr(column, attr, None)
+                if view is not None:
+                    view.release()
+        self.columns = []
+        self._by_name = {}
+        if getattr(self, "_view", None) is not None:
+            self._view.release()
+            self._view = None
+        if self._mmap is not None:
+            try:
+                self._mmap.close()
+            except BufferError:
+                ## A caller still holds a view from `PlainColumn.raw()`. The mapping is released once that view is
+                ##   garbage-collected.
+                pass
+            self._mmap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def open_ssf_cache(ssf_path, digest=None):
+    """
+    Open the sidecar of an SSF file if one exists and matches the current SSF contents. Returns None otherwise.
+    """
+    cache_path = cache_path_for(ssf_path)
+    if not os.path.isfile(cache_path):
+        return None
+    if digest is None:
+        digest = ssf_digest(ssf_path)
+    try:
+        cache = SSFCache(cache_path)
+    except (ValueError, OSError):
+        ## A damaged cache is treated like a stale one, so callers fall back to parsing the text.
+        return None
+    if cache.digest != digest:
+        cache.close()
+        return None
+    return cache
+
+
+def load_ssf(ssf_path):
+    """
+    Return an open SSFCache for the SSF file, (re)building the sidecar if it is missing or stale.
+    Returns None if the SSF has ragged rows and cannot be cached.
+    """
+    digest = ssf_digest(ssf_path)
+    cache = open_ssf_cache(ssf_path, digest)
+    if cache is not None:
+        return cache
+    with open(ssf_path, "r") as f:
+        headers, rows = parse_ssf_lines(f.readlines())
+    if write_ssf_cache(ssf_path, headers, rows, digest) is None:
+        return None
+    return open_ssf_cache(ssf_path, digest)
+
+
+def parse_args(args=None):
+    Description = "Build (or refresh) the columnar cache of one or more SSF files."
+    Epilog = "Example usage: python ssf_cache.py <FILE_IN> [<FILE_IN> ...]"
+
+    parser = argparse.ArgumentParser(description=Description, epilog=Epilog)
+    parser.add_argument("FILE_IN", nargs="+", help="Input SSF file(s).")
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    args = parse_args(args)
+    exit_code = 0
+    for ssf_path in args.FILE_IN:
+        cache = load_ssf(ssf_path)
+        if cache is None:
+            print(
+                "[ssf_cache.py] [File: {}] Rows with an unexpected number of columns were found. No cache was written.".format(
+                    os.path.basename(ssf_path)
+                )
+            )
+            exit_code = 1
+            continue
+        with cache:
+            print(
+                "[ssf_cache.py] [File: {}] Cached {} rows and {} columns in '{}'.".format(
+                    os.path.basename(ssf_path), len(cache), len(cache.headers), cache.path
+                )
+            )
+    return exit_code
+
+
+if __name__ == "__main__":
+    print("[ssf_cache.py]: version {}".format(VERSION), file=sys.stderr)
+    sys.exit(main())
@@ -0,0 +1,92 @@
+#!/usr/bin/env python
+
+## Compact, read-only representation of SSF rows.
+##   A plain `dict` per row carries its own hash table of ~24 keys, and every row holds its own copy of values like
+##   'ILLUMINA' or 'Illumina HiSeq X'. An SSFRecord instead stores the row values in a tuple, looks fields up through a
+##   column index shared by all records of the same header, and interns the values of low-cardinality columns so that
+##   all rows point to the same string object.
+##   Records are meant for holding whole SSFs in memory. Tools that handle one row at a time (e.g. `ssf_validator.py`)
+##   use plain dicts, since lookups through a Python-level Mapping are slower and there is nothing to save.
+
+VERSION = "1.1.0"
+
+import sys
+from collections.abc import Mapping
+
+## Columns with few distinct values within (and across) SSF files.
+INTERNED_COLUMNS = [
+    "udg",
+    "library_built",
+    "notes",
+    "study_accession",
+    "first_public",
+    "last_updated",
+    "instrument_model",
+    "library_layout",
+    "library_source",
+    "instrument_platform",
+    "library_strategy",
+]
+
+
+class SSFRecord(Mapping):
+    """
+    A single SSF row, usable wherever the `dict(zip(headers, row))` it replaces was used.
+    Like that dict, a row with fewer values than the header only has the leading columns, extra values are dropped, and
+    a column name that appears more than once in the header takes the last of its values.
+    Subclasses are created per header and row length by `make_record_type`, so that every lookup is a single dict lookup
+    in the column index shared by the class. Use `record_factory` to build records from rows of any length.
+    """
+
+    __slots__ = ("_values",)
+    _index = {}
+
+    def __init__(self, values):
+        self._values = tuple(values)
+
+    def __getitem__(self, key):
+        return self._values[self._index[key]]
+
+    def __len__(self):
+        return len(self._index)
+
+    def __iter__(self):
+        return iter(self._index)
+
+    def __repr__(self):
+        return "{}({})".format(type(self).__name__, dict(self))
+
+
+def make_record_type(headers, n_values=None):
+    """
+    Return an SSFRecord subclass for rows of the given header with `n_values` values (default: one per column).
+    The column index is built the same way `dict(zip(headers, row))` builds its keys, and is stored once on the class.
+    """
+    if n_values is None:
+        n_values = len(headers)
+    index = {name: idx for idx, name in enumerate(headers[:n_values])}
+    return type("SSFRecord", (SSFRecord,), {"__slots__": (), "_index": index})
+
+
+def record_factory(headers, interned_columns=INTERNED_COLUMNS):
+    """
+    Return a function that turns a list of row values into an SSFRecord, interning the values of `interned_columns`.
+    The list itself is left unchanged.
+    """
+    n_columns = len(headers)
+    record_types = {n_columns: make_record_type(headers)}
+    interned_idx = [idx for idx, name in enumerate(headers) if name in interned_columns]
+
+    def make_record(row):
+        values = row[:n_columns]
+        n_values = len(values)
+        for idx in interned_idx:
+            if idx < n_values:
+                values[idx] = sys.intern(values[idx])
+        record_type = record_types.get(n_values)
+        if record_type is None:
+            ## Short rows are rare, so their record types are only created when first needed.
+            record_type = record_types[n_values] = make_record_type(headers, n_values)
+        return record_type(values)
+
+    return make_record
@@ -2,7 +2,7 @@
 
 # MIT License (c) 2023 Thiseas C. Lamnidis
 
-VERSION = "1.0.1"
+VERSION = "1.3.4"
 
 import os
 import sys
@@ -11,12 +11,53 @@ import argparse
 import re
 
 
-def read_ssf_file(file_path, required_fields=None, error_counter=0):
-    file_name = os.path.basename(file_path.name)
-    l = file_path.readlines()
-    headers = l[0].split()
-    global SSF_HEADER  ## Pull header out of function scope
-    SSF_HEADER = headers
+REQUIRED_FIELDS = [
+    "poseidon_IDs",
+    "udg",
+    "library_built",
+    "instrument_model",
+    "instrument_platform",
+    "library_name",
+    "fastq_ftp",
+    "submitted_ftp",
+]
+
+## Sequencers nf-core/eager can process, by colour chemistry. Also used by `eager_input.py`.
+## Any updates to these lists should be reflected in `source_me.sh`.
+TWO_CHEM_SEQS = [
+    "NextSeq 2000",
+    "NextSeq 1000",
+    "NextSeq 500",
+    "NextSeq 550",
+    "Illumina NovaSeq 6000",
+    "Illumina NovaSeq X",
+    "Illumina NovaSeq X Plus",
+    "Illumina MiniSeq",
+]
+FOUR_CHEM_SEQS = [
+    "Illumina HiSeq 1000",
+    "Illumina HiSeq 1500",
+    "Illumina HiSeq 2000",
+    "Illumina HiSeq 2500",
+    "Illumina HiSeq 3000",
+    "Illumina HiSeq 4000",
+    "Illumina HiSeq X",
+    "Illumina HiSeq X Five", ## Same as below, but formatted differently in GSA.
+    "Illumina HiSeq X Ten",  ## Same as below, but formatted differently in GSA.
+    "HiSeq X Five",
+    "HiSeq X Ten",
+    "Illumina Genome Analyzer",
+    "Illumina Genome Analyzer II",
+    "Illumina Genome Analyzer IIx",
+    "Illumina HiScanSQ",
+    "Illumina MiSeq",
+]
+
+
+def check_ssf_header(headers, file_name, required_fields=None, error_counter=0):
+    """
+    Check that all required fields are in the SSF header, and exit if any are missing.
+    """
     if required_fields:
         for field in required_fields:
             if field not in headers:
@@ -40,7 +81,16 @@ def read_ssf_file(file_path, required_fields=None, error_counter=0):
         print(
             f"[ssf_validator.py] [File: {file_name}] WARNING: submitted_md5 column not found in SSF file. Please use the latest version of the SSF file creation scripts. This warning can be ignored if you are validating older SSF files."
         )
-    return map(lambda row: dict(zip(headers, row.strip().split("\t"))), l[1:])
+
+
+def read_ssf_file(file_path, required_fields=None, error_counter=0):
+    file_name = os.path.basename(file_path.name)
+    headers = file_path.readline().split()
+    global SSF_HEADER  ## Pull header out of function scope
+    SSF_HEADER = headers
+    check_ssf_header(headers, file_name, required_fields, error_counter)
+    ## Rows are only read and split once the caller gets to them, so the file is never held in memory as a whole.
+    return map(lambda row: dict(zip(headers, row.strip().split("\t"))), file_path)
 
 
 def isNAstr(var):
@@ -151,40 +201,10 @@ def validate_date_field(date_field, field_name, error_counter, line_num, file_na
 
 
 def validate_instrument_model(instrument_model, error_counter, line_num, file_name):
-    ## Any updates to these lists should be reflected in `source_me.sh`.
-    two_chem_seqs = [
-        "NextSeq 2000",
-        "NextSeq 1000",
-        "NextSeq 500",
-        "NextSeq 550",
-        "Illumina NovaSeq 6000",
-        "Illumina NovaSeq X",
-        "Illumina NovaSeq X Plus",
-        "Illumina MiniSeq",
-    ]
-    four_chem_seqs = [
-        "Illumina HiSeq 1000",
-        "Illumina HiSeq 1500",
-        "Illumina HiSeq 2000",
-        "Illumina HiSeq 2500",
-        "Illumina HiSeq 3000",
-        "Illumina HiSeq 4000",
-        "Illumina HiSeq X",
-        "Illumina HiSeq X Five", ## Same as below, but formatted differently in GSA.
-        "Illumina HiSeq X Ten",  ## Same as below, but formatted differently in GSA.
-        "HiSeq X Five",
-        "HiSeq X Ten",
-        "Illumina Genome Analyzer",
-        "Illumina Genome Analyzer II",
-        "Illumina Genome Analyzer IIx",
-        "Illumina HiScanSQ",
-        "Illumina MiSeq",
-    ]
-
-    if instrument_model not in two_chem_seqs + four_chem_seqs:
+    if instrument_model not in TWO_CHEM_SEQS + FOUR_CHEM_SEQS:
         error_counter = print_error(
             "[Invalid instrument_model formatting] instrument_model '{}' is not recognised as one that can be processed with nf-core/eager. Accepted values: {}".format(
-                instrument_model, ", ".join(two_chem_seqs + four_chem_seqs)
+                instrument_model, ", ".join(TWO_CHEM_SEQS + FOUR_CHEM_SEQS)
             ),
             "Line",
             line_num,
@@ -194,6 +214,169 @@ def validate_instrument_model(instrument_model, error_counter, line_num, file_na
     return error_counter
 
 
+def validate_ssf_entry(ssf_entry, n_columns, error_counter, line_num, file_name):
+    """
+    Validate the entries of a single SSF row against the needs of Minotaur processing. Returns the updated error counter.
+    """
+
+    # Check valid number of columns per row
+    # for key in ssf_entry.keys():
+    #     print(key, "=", ssf_entry[key])
+    # print(ssf_entry)
+    if len(ssf_entry) < n_columns:
+        error_counter = print_error(
+            "[Missing columns in row] Invalid number of columns (expected {}, got {})!".format(
+                n_columns, len(ssf_entry)
+            ),
+            "Line",
+            line_num,
+            error_counter,
+            file_name,
+        )
+
+    ## Check for spaces in entries
+    error_counter = complain_about_spaces(
+        ssf_entry, error_counter, line_num, file_name
+    )
+
+    ## Validate poseidon IDs
+    error_counter = validate_poseidon_ids(
+        ssf_entry["poseidon_IDs"], error_counter, line_num, file_name
+    )
+
+    ## Validate UDG
+    # print(ssf_entry["udg"])
+    if ssf_entry["udg"] not in ["minus", "half", "plus"]:
+        error_counter = print_error(
+            "[Invalid udg formatting] udg entry '{}' is not recognised. Options: minus, half, plus.".format(
+                ssf_entry["udg"]
+            ),
+            "Line",
+            line_num,
+            error_counter,
+            file_name,
+        )
+
+    ## Validate library_built
+    if ssf_entry["library_built"] not in ["ds", "ss"]:
+        error_counter = print_error(
+            "[Invalid library_built formatting] library_built entry '{}' is not recognised. Options: ds, ss.".format(
+                ssf_entry["library_built"]
+            ),
+            "Line",
+            line_num,
+            error_counter,
+            file_name,
+        )
+
+    ## Validate date fields (first_public, last_updated) if present
+    if "first_public" in ssf_entry:
+        error_counter = validate_date_field(
+            ssf_entry["first_public"],
+            "first_public",
+            error_counter,
+            line_num,
+            file_name,
+        )
+    if "last_updated" in ssf_entry:
+        error_counter = validate_date_field(
+            ssf_entry["last_updated"],
+            "last_updated",
+            error_counter,
+            line_num,
+            file_name,
+        )
+
+    ## Validate instrument_model
+    error_counter = validate_instrument_model(
+        ssf_entry["instrument_model"], error_counter, line_num, file_name
+    )
+
+    ## Validate instrument_platform
+    if ssf_entry["instrument_platform"] not in ["ILLUMINA"]:
+        error_counter = print_error(
+            "[Invalid instrument_platform] instrument_platform entry '{}' is not recognised. Options: ILLUMINA.".format(
+                ssf_entry["instrument_platform"]
+            ),
+            "Line",
+            line_num,
+            error_counter,
+            file_name,
+        )
+
+    ## Validate library_name
+    if not ssf_entry["library_name"]:
+        error_counter = print_error(
+            "[Library_name missing] library_name entry has not been specified!",
+            "Line",
+            line_num,
+            error_counter,
+            file_name,
+        )
+    elif isNAstr(ssf_entry["library_name"]):
+        error_counter = print_error(
+            "[Library_name missing] library_name cannot be 'n/a'!",
+            "Line",
+            line_num,
+            error_counter,
+            file_name,
+        )
+
+    ## Validate fastq_ftp
+    for reads in [ssf_entry["fastq_ftp"]]:
+        ## Since v 1.0.0, fastq_ftp can be empty, since then the bam in submitted_ftp will be converted back to FastQ automatically.
+        if isNAstr(reads):
+            pass
+        elif reads.find(" ") != -1:
+            error_counter = print_error(
+                "[Spaces in FastQ name] File names cannot contain spaces! Please rename.",
+                "Line",
+                line_num,
+                error_counter,
+                file_name,
+            )
+        ## Check that the fastq_ftp entry ends with a valid extension
+        elif (
+            not reads.endswith(".fastq.gz")
+            and not reads.endswith(".fq.gz")
+            and not reads.endswith(".fastq")
+            and not reads.endswith(".fq")
+            and not reads == ""
+        ):
+            error_counter = print_error(
+                "[Invalid FastQ file extension] FASTQ file(s) have unrecognised extension. Allowed extensions: .fastq.gz, .fq.gz, .fastq, .fq!",
+                "Line",
+                line_num,
+                error_counter,
+                file_name,
+            )
+
+    ## Ensure that submitted_ftp and submitted_md5 are not empty (should never be the case, but still.)
+    if isNAstr(ssf_entry["submitted_ftp"]):
+        error_counter = print_error(
+            "[Submitted_ftp missing] submitted_ftp entry has not been specified!",
+            "Line",
+            line_num,
+            error_counter,
+            file_name,
+        )
+
+    try:
+        if isNAstr(ssf_entry["submitted_md5"]):
+            error_counter = print_error(
+                "[Submitted_md5 missing] submitted_md5 entry has not been specified!",
+                "Line",
+                line_num,
+                error_counter,
+                file_name,
+            )
+    except KeyError:
+        ## This should only be validated if the column is present in the header, hence a KeyError is expected.
+        pass
+
+    return error_counter
+
+
 def validate_ssf(file_in):
     """
     This function checks that the SSF file contains all the expected columns, and validated the entries in the columns needed for Minotaur processing.
@@ -229,17 +412,6 @@ def validate_ssf(file_in):
             "submitted_ftp",
             "submitted_md5",
         ]
-        REQUIRED_FIELDS = [
-            "poseidon_IDs",
-            "udg",
-            "library_built",
-            "instrument_model",
-            "instrument_platform",
-            "library_name",
-            "fastq_ftp",
-            "submitted_ftp",
-        ]
-
         ## Check entries
         for line_num, ssf_entry in enumerate(
             read_ssf_file(fin, required_fields=REQUIRED_FIELDS)
@@ -247,162 +419,10 @@ def validate_ssf(file_in):
             line_num += (
                 2  ## From 0-based to 1-based. Add an extra 1 for the header line
             )
-
-            # Check valid number of columns per row
-            # for key in ssf_entry.keys():
-            #     print(key, "=", ssf_entry[key])
-            # print(ssf_entry)
-            if len(ssf_entry) < len(SSF_HEADER):
-                error_counter = print_error(
-                    "[Missing columns in row] Invalid number of columns (expected {}, got {})!".format(
-                        len(SSF_HEADER), len(ssf_entry)
-                    ),
-                    "Line",
-                    line_num,
-                    error_counter,
-                    file_name,
-                )
-
-            ## Check for spaces in entries
-            error_counter = complain_about_spaces(
-                ssf_entry, error_counter, line_num, file_name
-            )
-
-            ## Validate poseidon IDs
-            error_counter = validate_poseidon_ids(
-                ssf_entry["poseidon_IDs"], error_counter, line_num, file_name
-            )
-
-            ## Validate UDG
-            # print(ssf_entry["udg"])
-            if ssf_entry["udg"] not in ["minus", "half", "plus"]:
-                error_counter = print_error(
-                    "[Invalid udg formatting] udg entry '{}' is not recognised. Options: minus, half, plus.".format(
-                        ssf_entry["udg"]
-                    ),
-                    "Line",
-                    line_num,
-                    error_counter,
-                    file_name,
-                )
-
-            ## Validate library_built
-            if ssf_entry["library_built"] not in ["ds", "ss"]:
-                error_counter = print_error(
-                    "[Invalid library_built formatting] library_built entry '{}' is not recognised. Options: ds, ss.".format(
-                        ssf_entry["library_built"]
-                    ),
-                    "Line",
-                    line_num,
-                    error_counter,
-                    file_name,
-                )
-
-            ## Validate date fields (first_public, last_updated) if present
-            if "first_public" in ssf_entry:
-                error_counter = validate_date_field(
-                    ssf_entry["first_public"],
-                    "first_public",
-                    error_counter,
-                    line_num,
-                    file_name,
-                )
-            if "last_updated" in ssf_entry:
-                error_counter = validate_date_field(
-                    ssf_entry["last_updated"],
-                    "last_updated",
-                    error_counter,
-                    line_num,
-                    file_name,
-                )
-
-            ## Validate instrument_model
-            error_counter = validate_instrument_model(
-                ssf_entry["instrument_model"], error_counter, line_num, file_name
+            error_counter = validate_ssf_entry(
+                ssf_entry, len(SSF_HEADER), error_counter, line_num, file_name
             )
 
-            ## Validate instrument_platform
-            if ssf_entry["instrument_platform"] not in ["ILLUMINA"]:
-                error_counter = print_error(
-                    "[Invalid instrument_platform] instrument_platform entry '{}' is not recognised. Options: ILLUMINA.".format(
-                        ssf_entry["instrument_platform"]
-                    ),
-                    "Line",
-                    line_num,
-                    error_counter,
-                    file_name,
-                )
-
-            ## Validate library_name
-            if not ssf_entry["library_name"]:
-                error_counter = print_error(
-                    "[Library_name missing] library_name entry has not been specified!",
-                    "Line",
-                    line_num,
-                    error_counter,
-                    file_name,
-                )
-            elif isNAstr(ssf_entry["library_name"]):
-                error_counter = print_error(
-                    "[Library_name missing] library_name cannot be 'n/a'!",
-                    "Line",
-                    line_num,
-                    error_counter,
-                    file_name,
-                )
-
-            ## Validate fastq_ftp
-            for reads in [ssf_entry["fastq_ftp"]]:
-                ## Since v 1.0.0, fastq_ftp can be empty, since then the bam in submitted_ftp will be converted back to FastQ automatically.
-                if isNAstr(reads):
-                    pass
-                elif reads.find(" ") != -1:
-                    error_counter = print_error(
-                        "[Spaces in FastQ name] File names cannot contain spaces! Please rename.",
-                        "Line",
-                        line_num,
-                        error_counter,
-                        file_name,
-                    )
-                ## Check that the fastq_ftp entry ends with a valid extension
-                elif (
-                    not reads.endswith(".fastq.gz")
-                    and not reads.endswith(".fq.gz")
-                    and not reads.endswith(".fastq")
-                    and not reads.endswith(".fq")
-                    and not reads == ""
-                ):
-                    error_counter = print_error(
-                        "[Invalid FastQ file extension] FASTQ file(s) have unrecognised extension. Allowed extensions: .fastq.gz, .fq.gz, .fastq, .fq!",
-                        "Line",
-                        line_num,
-                        error_counter,
-                        file_name,
-                    )
-                    
-            ## Ensure that submitted_ftp and submitted_md5 are not empty (should never be the case, but still.)
-            if isNAstr(ssf_entry["submitted_ftp"]):
-                error_counter = print_error(
-                    "[Submitted_ftp missing] submitted_ftp entry has not been specified!",
-                    "Line",
-                    line_num,
-                    error_counter,
-                    file_name,
-                )
-            
-            try:
-                if isNAstr(ssf_entry["submitted_md5"]):
-                    error_counter = print_error(
-                        "[Submitted_md5 missing] submitted_md5 entry has not been specified!",
-                        "Line",
-                        line_num,
-                        error_counter,
-                        file_name,
-                    )
-            except KeyError:
-                ## This should only be validated if the column is present in the header, hence a KeyError is expected.
-                pass
-
     ## If formatting errors have occurred print their number and fail.
     if error_counter > 0:
         print(
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+
+## Local stand-in for the ENA filereport API, used to test `create_ssf_from_ena_project.py` without network access.
+##   Serves the table of an existing SSF (minus the columns added by the SSF creation scripts, unless --keep_ssf_columns
+##   is given), honouring the limit and offset parameters, and injects failures depending on the chosen mode:
+##     ok            No failures.
+##     flaky         The first request for some pages gets a 503, the first request for others is cut off mid-table.
+##     dead          Every request with an offset of --dead_offset or more gets a 500.
+##     out_of_range  Requests with an offset past the last row get a 400.
+##     short_page    The second page always comes back with only half of its rows, cut cleanly at a line boundary.
+##     ignore_offset The offset is ignored, so every page holds the first rows of the table.
+
+VERSION = "1.2.0"
+
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+SSF_ONLY_COLUMNS = ["poseidon_IDs", "udg", "library_built", "notes"]
+
+
+def read_table(ssf_path, keep_ssf_columns=False):
+    with open(ssf_path, "rb") as f:
+        lines = f.read().splitlines()
+    headers = lines[0].split(b"\t")
+    keep = [idx for idx, name in enumerate(headers) if keep_ssf_columns or name.decode() not in SSF_ONLY_COLUMNS]
+    return [b"\t".join(line.split(b"\t")[idx] for idx in keep) + b"\n" for line in lines]
+
+
+def make_handler(table, mode, dead_offset):
+    header, rows = table[0], table[1:]
+    requests_seen = {}
+    lock = threading.Lock()
+
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def send_status(self, code):
+            self.send_response(code)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def do_GET(self):
+            query = parse_qs(urlparse(self.path).query)
+            limit = int(query.get("limit", ["0"])[0])
+            offset = int(query.get("offset", ["0"])[0])
+            with lock:
+                attempt = requests_seen.get(offset, 0)
+                requests_seen[offset] = attempt + 1
+            if mode == "ignore_offset":
+                offset = 0
+            page = rows[offset : offset + limit] if limit else rows[offset:]
+            if mode == "short_page" and limit and offset == limit:
+                page = page[: len(page) // 2]
+            body = header + b"".join(page)
+
+            if mode == "dead" and offset >= dead_offset:
+                return self.send_status(500)
+            if mode == "out_of_range" and offset > 0 and offset >= len(rows):
+                return self.send_status(400)
+            if mode == "flaky" and attempt == 0 and limit and (offset // limit) % 3 == 0:
+                return self.send_status(503)
+            if mode == "flaky" and attempt == 0 and limit and (offset // limit) % 3 == 1:
+                ## Drop the connection half-way through the table.
+                self.send_response(200)
+                self.send_header("Connection", "close")
+                self.end_headers()
+                self.wfile.write(body[: len(body) // 2])
+                return
+            self.send_response(200)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+    return Handler
+
+
+def parse_args(args=None):
+    Description = "Serve the table of an SSF file like the ENA filereport API, optionally injecting failures."
+    Epilog = "Example usage: python ena_stand_in_server.py <SSF> 8701 --mode flaky"
+
+    parser = argparse.ArgumentParser(description=Description, epilog=Epilog)
+    parser.add_argument("SSF", help="SSF file whose table to serve.")
+    parser.add_argument("port", type=int, help="Port to listen on (on 127.0.0.1).")
+    parser.add_argument("--mode", choices=["ok", "flaky", "dead", "out_of_range", "short_page", "ignore_offset"], default="ok", help="Failures to inject. Default: ok")
+    parser.add_argument("--dead_offset", type=int, default=1000, help="First offset that fails in 'dead' mode. Default: 1000")
+    parser.add_argument("--keep_ssf_columns", action="store_true", help="Also serve the columns only found in SSFs (poseidon_IDs, udg, library_built, notes), so the output of a download can be compared to the SSF itself.")
+    return parser.parse_args(args)
+
+
+def main(args=None):
+    args = parse_args(args)
+    handler = make_handler(read_table(args.SSF, args.keep_ssf_columns), args.mode, args.dead_offset)
+    ThreadingHTTPServer(("127.0.0.1", args.port), handler).serve_forever()
+
+
+if __name__ == "__main__":
+    main()
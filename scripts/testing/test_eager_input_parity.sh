@@ -0,0 +1,81 @@
+#!/usr/bin/env bash
+
+VERSION='1.0.0'
+set -uo pipefail ## Pipefail, complain on new unassigned variables.
+
+## Tests that the Python port of the eager TSV creation (eager_input.py) stays in sync with create_eager_input.sh and
+##   source_me.sh. Both must produce the same TSV for every package SSF, and the streaming pipeline
+##   (create_recipe_from_accession.py) must reproduce the package SSF and TSV when a local stand-in ENA server (see
+##   ena_stand_in_server.py) serves it the table of that SSF.
+##   create_eager_input.sh writes into the package directory, so it is run on scratch copies of the packages.
+## usage: test_eager_input_parity.sh [<package_name> ...]
+
+script_dir=$(dirname $(readlink -f ${0}))
+repo_dir=$(readlink -f ${script_dir}/../..)
+pipeline_package='2025_Amjadi_NorthernIran' ## Has all SSF-only columns, and both two- and four-colour chemistry sequencers.
+port=18711
+work_dir=$(mktemp -d)
+server_pids=()
+failures=0
+
+if [[ ${#@} -gt 0 ]]; then
+  packages=("${@}")
+else
+  packages=($(ls ${repo_dir}/packages))
+fi
+
+function cleanup() {
+  kill ${server_pids[@]} 2>/dev/null
+  rm -rf ${work_dir}
+}
+trap cleanup EXIT
+
+function check() {
+  if [[ ${1} == 0 ]]; then
+    echo "PASS: ${2}"
+  else
+    echo "FAIL: ${2}"
+    let failures+=1
+  fi
+}
+
+## Scratch copy of the repository layout create_eager_input.sh expects.
+mkdir -p ${work_dir}/scripts ${work_dir}/python
+cp -r ${repo_dir}/scripts/delphis-bot_scripts ${work_dir}/scripts/
+
+for package_name in ${packages[@]}; do
+  ssf=${repo_dir}/packages/${package_name}/${package_name}.ssf
+  if [[ ! -f ${ssf} ]]; then
+    continue
+  fi
+  mkdir -p ${work_dir}/packages/${package_name}
+  cp ${ssf} ${work_dir}/packages/${package_name}/
+  bash ${work_dir}/scripts/delphis-bot_scripts/create_eager_input.sh ${package_name} 2>/dev/null
+  python ${repo_dir}/scripts/eager_input.py ${ssf} -o ${work_dir}/python/${package_name}.tsv >/dev/null 2>&1
+  cmp -s ${work_dir}/packages/${package_name}/${package_name}.tsv ${work_dir}/python/${package_name}.tsv
+  check $? "[${package_name}] eager_input.py and create_eager_input.sh create the same TSV"
+done
+
+## Streaming pipeline: the SSF-only columns are served too, so the SSF must come out unchanged, and the TSV as
+##   create_eager_input.sh makes it from that SSF.
+shell_tsv=${work_dir}/packages/${pipeline_package}/${pipeline_package}.tsv
+if [[ ! -f ${shell_tsv} ]]; then
+  mkdir -p ${work_dir}/packages/${pipeline_package}
+  cp ${repo_dir}/packages/${pipeline_package}/${pipeline_package}.ssf ${work_dir}/packages/${pipeline_package}/
+  bash ${work_dir}/scripts/delphis-bot_scripts/create_eager_input.sh ${pipeline_package} 2>/dev/null
+fi
+python ${script_dir}/ena_stand_in_server.py ${repo_dir}/packages/${pipeline_package}/${pipeline_package}.ssf ${port} --mode ok --keep_ssf_columns &
+server_pids+=($!)
+sleep 2
+python ${repo_dir}/scripts/create_recipe_from_accession.py PRJTEST ${pipeline_package} -o ${work_dir}/pipeline --ena_url http://127.0.0.1:${port}/filereport >/dev/null 2>&1
+check $? "[${pipeline_package}] streaming pipeline finds no validation errors"
+cmp -s ${work_dir}/pipeline/${pipeline_package}.ssf ${repo_dir}/packages/${pipeline_package}/${pipeline_package}.ssf
+check $? "[${pipeline_package}] streaming pipeline writes the SSF unchanged"
+cmp -s ${work_dir}/pipeline/${pipeline_package}.tsv ${shell_tsv}
+check $? "[${pipeline_package}] streaming pipeline and create_eager_input.sh create the same TSV"
+
+if [[ ${failures} -gt 0 ]]; then
+  echo "${failures} test(s) failed."
+  exit 1
+fi
+echo "All tests passed."
@@ -0,0 +1,94 @@
+#!/usr/bin/env bash
+
+VERSION='1.1.0'
+set -uo pipefail ## Pipefail, complain on new unassigned variables.
+
+## Tests the paged download mode of create_ssf_from_ena_project.py against local stand-in ENA servers that inject
+##   failures (see ena_stand_in_server.py). Every paged download must produce the same SSF as a single-request download.
+## usage: test_paged_ena_download.sh [<SSF_to_serve>] [<first_port>]
+
+script_dir=$(dirname $(readlink -f ${0}))
+repo_dir=${script_dir}/../..
+ssf=${1:-${repo_dir}/packages/2021_PattersonNature/2021_PattersonNature.ssf}
+let port=${2:-18701}
+create_ssf="python ${repo_dir}/scripts/create_ssf_from_ena_project.py PRJTEST"
+work_dir=$(mktemp -d)
+server_pids=()
+failures=0
+
+function cleanup() {
+  kill ${server_pids[@]} 2>/dev/null
+  rm -rf ${work_dir}
+}
+trap cleanup EXIT
+
+function start_server() {
+  python ${script_dir}/ena_stand_in_server.py ${ssf} ${1} --mode ${2} &
+  server_pids+=($!)
+}
+
+function check() {
+  if [[ ${1} == 0 ]]; then
+    echo "PASS: ${2}"
+  else
+    echo "FAIL: ${2}"
+    let failures+=1
+  fi
+}
+
+let ok_port=port flaky_port=port+1 dead_port=port+2 range_port=port+3 short_port=port+4 ignore_port=port+5
+start_server ${ok_port} ok
+start_server ${flaky_port} flaky
+start_server ${dead_port} dead
+start_server ${range_port} out_of_range
+start_server ${short_port} short_page
+start_server ${ignore_port} ignore_offset
+sleep 2
+
+cd ${work_dir}
+${create_ssf} -o reference.ssf --ena_url http://127.0.0.1:${ok_port}/filereport 2>/dev/null
+check $? "single-request download"
+
+## Retries: 503s and tables cut off mid-way are retried until each page is complete.
+${create_ssf} -o flaky.ssf --page_size 100 --threads 4 --ena_url http://127.0.0.1:${flaky_port}/filereport 2>flaky.log
+cmp -s flaky.ssf reference.ssf
+check $? "paged download with 503s and truncated pages matches the single-request download"
+grep -q "Retrying" flaky.log
+check $? "failed pages were retried"
+
+## Resume: a run that fails part-way keeps its finished pages, and a rerun only fetches the rest.
+${create_ssf} -o resumed.ssf --page_size 100 --threads 3 --retries 1 --ena_url http://127.0.0.1:${dead_port}/filereport 2>/dev/null
+[[ $? != 0 && ! -f resumed.ssf && -n $(ls resumed.ssf.pages/page_*.tsv 2>/dev/null) ]]
+check $? "failed download exits with an error and keeps its checkpoints"
+${create_ssf} -o resumed.ssf --page_size 100 --threads 3 --ena_url http://127.0.0.1:${ok_port}/filereport 2>resume.log
+cmp -s resumed.ssf reference.ssf && grep -q "Resuming download" resume.log && [[ ! -d resumed.ssf.pages ]]
+check $? "resumed download matches the single-request download and removes its checkpoints"
+
+## End of table: pages past the end of the table are never requested, so servers that reject such offsets are fine.
+${create_ssf} -o out_of_range.ssf --page_size 500 --threads 6 --ena_url http://127.0.0.1:${range_port}/filereport 2>/dev/null
+cmp -s out_of_range.ssf reference.ssf
+check $? "paged download from a server that rejects offsets past the end of the table"
+
+## Consistency: pages that disagree with the run accessions of the whole table fail the download instead of giving a
+##   silently truncated or duplicated SSF.
+${create_ssf} -o short.ssf --page_size 100 --ena_url http://127.0.0.1:${short_port}/filereport 2>short.log
+[[ $? != 0 && ! -f short.ssf ]] && grep -q "Page 1 has 50 rows, but 100 were expected" short.log
+check $? "a page cut short at a line boundary fails the download"
+${create_ssf} -o ignored.ssf --page_size 100 --ena_url http://127.0.0.1:${ignore_port}/filereport 2>ignored.log
+[[ $? != 0 && ! -f ignored.ssf ]] && grep -q "do not add up to the table" ignored.log
+check $? "a server that ignores the offset fails the download"
+
+## Page boundaries: one row per page, and pages that exactly divide the table (ending in an empty page).
+${create_ssf} -o one_row.ssf --page_size 1 --threads 16 --ena_url http://127.0.0.1:${ok_port}/filereport 2>/dev/null
+cmp -s one_row.ssf reference.ssf
+check $? "paged download with one row per page"
+let half=($(wc -l < reference.ssf)-1)/2
+${create_ssf} -o exact.ssf --page_size ${half} --ena_url http://127.0.0.1:${ok_port}/filereport 2>/dev/null
+cmp -s exact.ssf reference.ssf
+check $? "paged download with pages that exactly divide the table"
+
+if [[ ${failures} -gt 0 ]]; then
+  echo "${failures} test(s) failed."
+  exit 1
+fi
+echo "All tests passed."